@@ -4,19 +4,30 @@ PDF Automation Tool - Flask Backend
 A comprehensive web-based PDF manipulation tool for resumes and documents
 """
 
-from flask import Flask, request, jsonify, send_file, render_template
+from flask import Flask, request, jsonify, send_file, render_template, abort
 from flask_cors import CORS
 import os
 import io
+import hashlib
+import shutil
 from pathlib import Path
 import tempfile
-from werkzeug.utils import secure_filename
 from datetime import datetime
 import logging
+import contextlib
+import mmap
+from collections import OrderedDict
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
 
 # PDF Libraries
-from PyPDF2 import PdfReader, PdfWriter, PdfMerger
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject, NumberObject
 from reportlab.pdfgen import canvas
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.colors import black, gray, blue
 from reportlab.lib.units import inch
@@ -24,18 +35,35 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_LEFT, TA_CENTER
 
+# Optional: pikepdf (QPDF) opens documents lazily, which speeds up split/rotate on large files
+try:
+    import pikepdf
+except ImportError:
+    pikepdf = None
+
 app = Flask(__name__)
 CORS(app)
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 OUTPUT_FOLDER = 'outputs'
-ALLOWED_EXTENSIONS = {'pdf'}
+TEXT_CACHE_FOLDER = os.path.join('cache', 'text')  # kept outside OUTPUT_FOLDER so it is never downloadable
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+FILENAME_TIMESTAMP_FORMAT = '%Y%m%d_%H%M%S'
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+SPOOL_MAX_SIZE = 8 * 1024 * 1024  # requests below this stay in memory
+OUTPUT_BUFFER_SIZE = 1024 * 1024  # 1MB
+SPLIT_MAX_WORKERS = min(4, os.cpu_count() or 1)  # per web worker process, across all requests
+SPLIT_PARALLEL_MIN_CHUNKS = 4  # below this, process start-up outweighs the gain
+USE_PIKEPDF = pikepdf is not None and os.environ.get('USE_PIKEPDF', '1') != '0'
+TEXT_CACHE_MAX_BYTES = 100 * 1024 * 1024  # 100MB of cached extractions on disk
+WATERMARK_CACHE_SIZE = 64  # rendered watermark overlays kept in memory
+TEXT_SHOW_OPERATORS = (b"Tj", b"TJ", b"'", b'"')
 
 # Create directories
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+os.makedirs(TEXT_CACHE_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
@@ -45,174 +73,513 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Widths of the common watermark strings at 40pt Helvetica, so the hot path skips the AFM lookup
+WATERMARK_WIDTHS = {
+    (text, "Helvetica"): stringWidth(text, "Helvetica", 40)
+    for text in ("CONFIDENTIAL", "DRAFT", "COPY", "SAMPLE", "INTERNAL")
+}
+
+# Cover letter styles (built once, shared by every request)
+_STYLES = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_STYLES['Heading1'],
+    fontSize=16,
+    spaceAfter=30,
+    textColor=blue,
+    alignment=TA_CENTER
+)
+
+HEADER_STYLE = ParagraphStyle(
+    'Header',
+    parent=_STYLES['Normal'],
+    fontSize=12,
+    spaceAfter=20,
+    alignment=TA_LEFT
+)
+
+BODY_STYLE = ParagraphStyle(
+    'Body',
+    parent=_STYLES['Normal'],
+    fontSize=11,
+    spaceAfter=12,
+    alignment=TA_LEFT
+)
+
+COVER_LETTER_BODY = (
+    "I am writing to express my strong interest in the {position} position at {company}. With my background and passion for this field, I am confident that I would be a valuable addition to your team.",
+    
+    "In my previous experience, I have developed strong technical skills and a deep understanding of industry best practices. I am particularly drawn to this opportunity because of your company's reputation for innovation and excellence.",
+    
+    "I would welcome the opportunity to discuss how my skills and enthusiasm can contribute to {company}'s continued success. Thank you for considering my application. I look forward to hearing from you soon."
+)
+
+@lru_cache(maxsize=512)
+def cover_letter_body(position, company):
+    """Body paragraph texts with their parsed markup fragments, memoized per job.
+    
+    Flowables carry per-build layout state, so each request still gets fresh
+    Paragraph objects; passing the cached frags just skips the markup parse.
+    """
+    body = []
+    for template in COVER_LETTER_BODY:
+        text = template.format(position=position, company=company)
+        body.append((text, Paragraph(text, BODY_STYLE).frags))
+    return tuple(body)
+
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return filename.lower().endswith('.pdf')
+
+def filename_timestamp():
+    return datetime.now().strftime(FILENAME_TIMESTAMP_FORMAT)
 
-def generate_filename(base_name, extension='.pdf'):
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+def generate_filename(base_name, timestamp=None, extension='.pdf'):
+    # Callers naming several outputs at once pass one shared filename_timestamp()
+    if timestamp is None:
+        timestamp = filename_timestamp()
     return f"{base_name}_{timestamp}{extension}"
 
+def file_digest(pdf_file):
+    """SHA-256 fingerprint of a file's contents, used as the cache key"""
+    if not isinstance(pdf_file, str):
+        digest = hashlib.file_digest(pdf_file, 'sha256').hexdigest()
+        pdf_file.seek(0)
+        return digest
+    with open(pdf_file, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+def save_upload(file):
+    """Stream an upload while hashing it; returns (pdf_file, sha256 hex).
+    
+    Requests under SPOOL_MAX_SIZE are kept in an in-memory spooled file and
+    never touch UPLOAD_FOLDER; larger ones are written there under a unique
+    temporary name. Either way pdf_file can be handed straight to PdfReader.
+    """
+    digest = hashlib.sha256()
+    
+    if request.content_length is not None and request.content_length < SPOOL_MAX_SIZE:
+        pdf_file = out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    else:
+        # A unique name per upload: a shared, client-chosen path could be truncated
+        # by a second request while the first still has it memory-mapped
+        fd, pdf_file = tempfile.mkstemp(dir=app.config['UPLOAD_FOLDER'], suffix='.pdf')
+        out = os.fdopen(fd, 'wb')
+    
+    try:
+        while chunk := file.stream.read(UPLOAD_CHUNK_SIZE):
+            out.write(chunk)
+            digest.update(chunk)
+    except Exception:
+        # A dropped connection must not leave a partial upload behind
+        out.close()
+        if isinstance(pdf_file, str):
+            os.remove(pdf_file)
+        raise
+    
+    if isinstance(pdf_file, str):
+        out.close()
+    else:
+        out.seek(0)
+    
+    return pdf_file, digest.hexdigest()
+
+def release_upload(pdf_file):
+    """Discard an upload returned by save_upload()"""
+    if isinstance(pdf_file, str):
+        os.remove(pdf_file)
+    else:
+        pdf_file.close()
+
+@contextlib.contextmanager
+def open_reader(pdf_file):
+    """Open a PdfReader; on-disk uploads are memory-mapped rather than read into the heap.
+    
+    The mapping is unmapped when the block exits, so anything that still reads
+    from the reader (including PdfWriter.write()) must run inside it.
+    """
+    if not isinstance(pdf_file, str):
+        yield PdfReader(pdf_file)
+        return
+    
+    with open(pdf_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap rejects empty files; let PdfReader report the invalid PDF
+            yield PdfReader(pdf_file)
+            return
+        with mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ) as mm:
+            yield PdfReader(mm)
+
+def write_pdf(writer, output_path):
+    """Serialize a PdfWriter through a large buffer so output costs few write() calls"""
+    with open(output_path, 'wb', buffering=OUTPUT_BUFFER_SIZE) as output_file:
+        writer.write(output_file)
+
+def has_text_operators(page):
+    """Cheap pre-scan so pages without any text object skip PyPDF2's tokenizer.
+    
+    Text is only shown by the Tj, TJ, ' and " operators inside a BT ... ET
+    block, so a decoded content stream lacking those bytes has nothing to
+    extract (reportlab, for one, emits an empty BT/ET on every page). Form
+    XObjects may carry their own text, so pages that use them always go
+    through the full extractor.
+    """
+    if "/Resources" in page and "/XObject" in page["/Resources"]:
+        for xobject in page["/Resources"]["/XObject"].values():
+            if xobject.get_object().get("/Subtype") == "/Form":
+                return True
+    
+    if "/Contents" not in page:
+        return False
+    contents = page["/Contents"]
+    streams = contents if isinstance(contents, ArrayObject) else [contents]
+    for stream in streams:
+        data = stream.get_object().get_data()
+        if b"BT" in data and any(op in data for op in TEXT_SHOW_OPERATORS):
+            return True
+    return False
+
+def write_split_chunk(reader, start_page, end_page, output_path):
+    """Write pages [start_page, end_page) of reader to their own PDF"""
+    writer = PdfWriter()
+    for page_num in range(start_page, end_page):
+        writer.add_page(reader.pages[page_num])
+    write_pdf(writer, output_path)
+
+# One pool per web worker process, created on first use and shared by every
+# split request, so concurrent splits never fork more than SPLIT_MAX_WORKERS.
+# Children come from a forkserver rather than a plain fork of the web worker,
+# so they don't inherit the mappings of uploads other requests have open.
+_split_pool = None
+_split_pool_lock = threading.Lock()
+
+def split_pool():
+    global _split_pool
+    with _split_pool_lock:
+        if _split_pool is None:
+            _split_pool = ProcessPoolExecutor(max_workers=SPLIT_MAX_WORKERS,
+                                             mp_context=multiprocessing.get_context('forkserver'))
+        return _split_pool
+
+def reset_split_pool():
+    """Drop a pool whose worker died so the next split starts a fresh one"""
+    global _split_pool
+    with _split_pool_lock:
+        if _split_pool is not None:
+            _split_pool.shutdown(wait=False, cancel_futures=True)
+            _split_pool = None
+
+def _split_worker_chunk(pdf_path, start_page, end_page, output_path):
+    # Nothing is cached across tasks, so no child keeps a deleted upload mapped
+    with open_reader(pdf_path) as reader:
+        write_split_chunk(reader, start_page, end_page, output_path)
+
+def prune_text_cache():
+    """Delete the least recently used cached extractions once TEXT_CACHE_MAX_BYTES is exceeded"""
+    entries = []
+    total_size = 0
+    for entry in os.scandir(TEXT_CACHE_FOLDER):
+        if entry.is_file() and entry.name.endswith('.txt'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+    
+    for _, size, path in sorted(entries):
+        if total_size <= TEXT_CACHE_MAX_BYTES:
+            break
+        # Another worker may have pruned the same entry already
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        total_size -= size
+
+def text_preview(text):
+    return text[:1000] + "..." if len(text) > 1000 else text
+
 class PDFProcessor:
     """Main class for PDF operations"""
     
     def __init__(self):
         self.upload_folder = UPLOAD_FOLDER
         self.output_folder = OUTPUT_FOLDER
+        self._wm_cache = OrderedDict()
     
-    def merge_pdfs(self, file_paths, output_filename):
+    def merge_pdfs(self, pdf_files, output_filename):
         """Merge multiple PDF files"""
         try:
-            merger = PdfMerger()
-            
-            for file_path in file_paths:
-                if os.path.exists(file_path):
-                    merger.append(file_path)
-            
+            writer = PdfWriter()
             output_path = os.path.join(self.output_folder, output_filename)
-            merger.write(output_path)
-            merger.close()
             
-            # Cleanup uploaded files
-            for file_path in file_paths:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+            # The writer resolves pages from every reader at write time, so all stay open until then
+            with contextlib.ExitStack() as readers:
+                # save_upload() has just written every upload, so no stat() per file
+                for pdf_file in pdf_files:
+                    writer.append(readers.enter_context(open_reader(pdf_file)))
+                write_pdf(writer, output_path)
+            writer.close()
             
             return output_path
         except Exception as e:
             logger.error(f"Error merging PDFs: {str(e)}")
             raise
+        finally:
+            # Cleanup uploaded files, whether or not the merge succeeded
+            for pdf_file in pdf_files:
+                release_upload(pdf_file)
     
-    def add_watermark(self, pdf_path, watermark_text, output_filename):
-        try:
-           reader = PdfReader(pdf_path)
-           writer = PdfWriter()
+    def _make_watermark_page(self, watermark_text, page_size=letter, font="Helvetica", angle=45):
+        """Render the watermark overlay once and reuse it for later requests"""
+        key = (watermark_text, page_size, font, angle)
+        if key in self._wm_cache:
+            self._wm_cache.move_to_end(key)
+            return self._wm_cache[key]
         
-           # Create watermark
-           watermark_buffer = io.BytesIO()
-           c = canvas.Canvas(watermark_buffer, pagesize=letter)
+        # Create watermark
+        watermark_buffer = io.BytesIO()
+        c = canvas.Canvas(watermark_buffer, pagesize=page_size)
         
-           # Set watermark properties
-           c.setFillColorRGB(0.5, 0.5, 0.5, alpha=0.3)  # Gray with transparency
-           c.setFont("Helvetica", 40)
+        # Set watermark properties
+        c.setFillColorRGB(0.5, 0.5, 0.5, alpha=0.3)  # Gray with transparency
+        c.setFont(font, 40)
         
-           # Get page dimensions
-           page_width, page_height = letter
+        # Get page dimensions
+        page_width, page_height = page_size
         
-           # Save graphics state
-           c.saveState()
+        # Save graphics state
+        c.saveState()
         
         # Rotate and position the watermark
-           c.translate(page_width/2, page_height/2)  # Move to center
-           c.rotate(45)  # Rotate 45 degrees
+        c.translate(page_width/2, page_height/2)  # Move to center
+        c.rotate(angle)
         
         # Draw text centered at origin (which is now center of page)
-           text_width = c.stringWidth(watermark_text.upper(), "Helvetica", 40)
-           c.drawString(-text_width/2, 0, watermark_text.upper())
+        text = watermark_text.upper()
+        text_width = WATERMARK_WIDTHS.get((text, font))
+        if text_width is None:
+            text_width = c.stringWidth(text, font, 40)
+        c.drawString(-text_width/2, 0, text)
         
         # Restore graphics state
-           c.restoreState()
-           c.save()
-           watermark_buffer.seek(0)
-        
-           watermark_reader = PdfReader(watermark_buffer)
-           watermark_page = watermark_reader.pages[0]
-        
-        # Apply watermark to each page
-           for page in reader.pages:
-               page.merge_page(watermark_page)
-               writer.add_page(page)
-        
-           output_path = os.path.join(self.output_folder, output_filename)
-           with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
-        
-        # Cleanup
-           os.remove(pdf_path)
-           return output_path
+        c.restoreState()
+        c.save()
+        watermark_buffer.seek(0)
+        
+        watermark_page = PdfReader(watermark_buffer).pages[0]
+        self._wm_cache[key] = watermark_page
+        if len(self._wm_cache) > WATERMARK_CACHE_SIZE:
+            self._wm_cache.popitem(last=False)
+        return watermark_page
+    
+    def _watermark_stamp(self, writer, watermark_page):
+        """Copy the overlay into writer as a Form XObject that pages can reference"""
+        form = DecodedStreamObject()
+        form.set_data(watermark_page.get_contents().get_data())
+        form.update({
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Form"),
+            NameObject("/BBox"): ArrayObject(FloatObject(v) for v in watermark_page.trimbox),
+            NameObject("/Resources"): watermark_page["/Resources"].clone(writer),
+        })
         
-        except Exception as e:
-          logger.error(f"Error adding watermark: {str(e)}")
-          raise
-
-    def extract_text(self, pdf_path):
-        """Extract text from PDF"""
+        begin = DecodedStreamObject()
+        begin.set_data(b"q\n")
+        return {'form': writer._add_object(form), 'begin': writer._add_object(begin), 'end': {}}
+    
+    def _stamp_page(self, writer, page, stamp):
+        """Draw the watermark over a page without re-parsing its content stream.
+        
+        The original content is left untouched and bracketed by q/Q, so the cost
+        per page is constant instead of proportional to the page's content.
+        """
+        if "/Resources" not in page:
+            page[NameObject("/Resources")] = DictionaryObject()
+        resources = page["/Resources"]
+        if "/XObject" not in resources:
+            resources[NameObject("/XObject")] = DictionaryObject()
+        xobjects = resources["/XObject"]
+        
+        # Resource dicts are often shared between pages, so an existing entry may
+        # already be ours
+        n = 0
+        while f"/Wm{n}" in xobjects and xobjects.raw_get(f"/Wm{n}") != stamp['form']:
+            n += 1
+        name = f"/Wm{n}"
+        xobjects[NameObject(name)] = stamp['form']
+        
+        if name not in stamp['end']:
+            end = DecodedStreamObject()
+            end.set_data(f"\nQ\nq {name} Do Q\n".encode())
+            stamp['end'][name] = writer._add_object(end)
+        
+        contents = page["/Contents"] if "/Contents" in page else []
+        if not isinstance(contents, (ArrayObject, list)):
+            contents = [page.raw_get("/Contents")]
+        page[NameObject("/Contents")] = ArrayObject([stamp['begin'], *contents, stamp['end'][name]])
+    
+    def add_watermark(self, pdf_file, watermark_text, output_filename):
+        """Add a diagonal text watermark to every page"""
         try:
-            reader = PdfReader(pdf_path)
-            text_content = []
+            writer = PdfWriter()
+            watermark_page = self._make_watermark_page(watermark_text)
+            stamp = self._watermark_stamp(writer, watermark_page)
+            output_path = os.path.join(self.output_folder, output_filename)
+            
+            with open_reader(pdf_file) as reader:
+                # Apply watermark to each page
+                for page in reader.pages:
+                    self._stamp_page(writer, writer.add_page(page), stamp)
+                write_pdf(writer, output_path)
             
-            for page_num, page in enumerate(reader.pages, 1):
-                page_text = page.extract_text()
-                text_content.append(f"--- Page {page_num} ---\n{page_text}\n")
+            return output_path
             
-            full_text = "\n".join(text_content)
+        except Exception as e:
+            logger.error(f"Error adding watermark: {str(e)}")
+            raise
+        finally:
+            # Cleanup
+            release_upload(pdf_file)
+    
+    def extract_text(self, pdf_file, force_refresh=False, digest=None):
+        """Extract text from PDF, reusing a cached result for identical uploads"""
+        try:
+            if digest is None:
+                digest = file_digest(pdf_file)
+            cache_path = os.path.join(TEXT_CACHE_FOLDER, f"{digest}.txt")
             
-            # Save as text file
-            output_filename = generate_filename("extracted_text", ".txt")
+            output_filename = generate_filename("extracted_text", extension=".txt")
             output_path = os.path.join(self.output_folder, output_filename)
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(full_text)
+            if not force_refresh and os.path.exists(cache_path):
+                shutil.copyfile(cache_path, output_path)
+                # Refresh the mtime so pruning evicts least recently used entries first
+                os.utime(cache_path)
+                # newline='' keeps PyPDF2's bare \r intact, matching the fresh-extraction preview
+                with open(cache_path, 'r', encoding='utf-8', newline='') as f:
+                    preview_text = f.read(1001)
+                return output_path, text_preview(preview_text)
             
-            # Cleanup
-            os.remove(pdf_path)
-            return output_path, full_text[:1000] + "..." if len(full_text) > 1000 else full_text
+            preview_buf = ""
+            
+            # Stream each page straight to the text file so only one page is held in memory
+            with open_reader(pdf_file) as reader, open(output_path, 'w', encoding='utf-8', newline='') as f:
+                for page_num, page in enumerate(reader.pages, 1):
+                    page_text = page.extract_text() if has_text_operators(page) else ""
+                    chunk = f"--- Page {page_num} ---\n{page_text}\n"
+                    if page_num > 1:
+                        chunk = "\n" + chunk
+                    f.write(chunk)
+                    
+                    # One character past the limit is enough for text_preview() to add "..."
+                    if len(preview_buf) <= 1000:
+                        preview_buf += chunk[:1001 - len(preview_buf)]
+            
+            # Populate the cache atomically so concurrent readers never see a partial file
+            # mkstemp gives each thread its own temporary name within the worker process
+            fd, tmp_cache_path = tempfile.mkstemp(dir=TEXT_CACHE_FOLDER, suffix='.tmp')
+            os.close(fd)
+            shutil.copyfile(output_path, tmp_cache_path)
+            os.replace(tmp_cache_path, cache_path)
+            prune_text_cache()
+            
+            return output_path, text_preview(preview_buf)
             
         except Exception as e:
             logger.error(f"Error extracting text: {str(e)}")
             raise
+        finally:
+            # Cleanup
+            release_upload(pdf_file)
+    
+    def _split_plan(self, total_pages, pages_per_file):
+        """Page ranges for split_pdf and the output path of each"""
+        chunks = [(start_page, min(start_page + pages_per_file, total_pages))
+                  for start_page in range(0, total_pages, pages_per_file)]
+        timestamp = filename_timestamp()
+        output_files = [
+            os.path.join(self.output_folder, generate_filename(f"split_pages_{start_page+1}-{end_page}", timestamp))
+            for start_page, end_page in chunks
+        ]
+        return chunks, output_files
     
-    def split_pdf(self, pdf_path, pages_per_file):
+    def _split_with_pikepdf(self, pdf_file, pages_per_file):
+        """QPDF loads page objects lazily, so only the pages being copied are parsed"""
+        with pikepdf.open(pdf_file) as pdf:
+            chunks, output_files = self._split_plan(len(pdf.pages), pages_per_file)
+            for (start_page, end_page), output_path in zip(chunks, output_files):
+                with pikepdf.new() as part:
+                    part.pages.extend(pdf.pages[start_page:end_page])
+                    part.save(output_path)
+        return output_files
+    
+    def split_pdf(self, pdf_file, pages_per_file):
         """Split PDF into multiple files"""
         try:
-            reader = PdfReader(pdf_path)
-            total_pages = len(reader.pages)
-            output_files = []
+            if USE_PIKEPDF:
+                return self._split_with_pikepdf(pdf_file, pages_per_file)
             
-            for start_page in range(0, total_pages, pages_per_file):
-                writer = PdfWriter()
-                end_page = min(start_page + pages_per_file, total_pages)
+            with open_reader(pdf_file) as reader:
+                chunks, output_files = self._split_plan(len(reader.pages), pages_per_file)
                 
-                for page_num in range(start_page, end_page):
-                    writer.add_page(reader.pages[page_num])
-                
-                output_filename = generate_filename(f"split_pages_{start_page+1}-{end_page}")
-                output_path = os.path.join(self.output_folder, output_filename)
-                
-                with open(output_path, 'wb') as output_file:
-                    writer.write(output_file)
-                
-                output_files.append(output_path)
+                # Only on-disk uploads go to the pool: workers open them by path, so just
+                # page ranges cross the pipe. Spooled uploads are small enough to split inline.
+                if (isinstance(pdf_file, str) and SPLIT_MAX_WORKERS > 1
+                        and len(chunks) >= SPLIT_PARALLEL_MIN_CHUNKS):
+                    try:
+                        futures = [
+                            split_pool().submit(_split_worker_chunk, pdf_file, start_page, end_page, output_path)
+                            for (start_page, end_page), output_path in zip(chunks, output_files)
+                        ]
+                        for future in futures:
+                            future.result()
+                    except BrokenProcessPool:
+                        reset_split_pool()
+                        raise
+                else:
+                    for (start_page, end_page), output_path in zip(chunks, output_files):
+                        write_split_chunk(reader, start_page, end_page, output_path)
             
-            # Cleanup
-            os.remove(pdf_path)
             return output_files
             
         except Exception as e:
             logger.error(f"Error splitting PDF: {str(e)}")
             raise
+        finally:
+            # Cleanup
+            release_upload(pdf_file)
     
-    def rotate_pdf(self, pdf_path, angle, output_filename):
+    def rotate_pdf(self, pdf_file, angle, output_filename):
         """Rotate all pages in PDF"""
         try:
-            reader = PdfReader(pdf_path)
-            writer = PdfWriter()
-            
-            for page in reader.pages:
-                # PyPDF2 expects 90, 180, or 270 degrees for clockwise rotation
-                rotated_page = page.rotate(angle)
-                writer.add_page(rotated_page)
+            # /Rotate only accepts 90, 180, or 270 degrees for clockwise rotation
+            if angle % 90 != 0:
+                raise ValueError("Rotation angle must be a multiple of 90")
             
             output_path = os.path.join(self.output_folder, output_filename)
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
             
-            # Cleanup
-            os.remove(pdf_path)
+            if USE_PIKEPDF:
+                with pikepdf.open(pdf_file) as pdf:
+                    for page in pdf.pages:
+                        page.rotate(angle, relative=True)
+                    pdf.save(output_path)
+            else:
+                writer = PdfWriter()
+                
+                def set_rotation(page):
+                    # Rotation is a single page dictionary entry; the content stream is untouched
+                    current = page["/Rotate"] if "/Rotate" in page else 0
+                    page[NameObject("/Rotate")] = NumberObject((current + angle) % 360)
+                
+                with open_reader(pdf_file) as reader:
+                    writer.append_pages_from_reader(reader, after_page_append=set_rotation)
+                    write_pdf(writer, output_path)
+            
             return output_path
             
         except Exception as e:
             logger.error(f"Error rotating PDF: {str(e)}")
             raise
+        finally:
+            # Cleanup
+            release_upload(pdf_file)
     
     def create_cover_letter(self, name, position, company, email="", phone="", output_filename="cover_letter.pdf"):
         """Create a professional cover letter template"""
@@ -220,78 +587,43 @@ class PDFProcessor:
             output_path = os.path.join(self.output_folder, output_filename)
             doc = SimpleDocTemplate(output_path, pagesize=letter, topMargin=1*inch)
             
-            # Styles
-            styles = getSampleStyleSheet()
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=16,
-                spaceAfter=30,
-                textColor=blue,
-                alignment=TA_CENTER
-            )
-            
-            header_style = ParagraphStyle(
-                'Header',
-                parent=styles['Normal'],
-                fontSize=12,
-                spaceAfter=20,
-                alignment=TA_LEFT
-            )
-            
-            body_style = ParagraphStyle(
-                'Body',
-                parent=styles['Normal'],
-                fontSize=11,
-                spaceAfter=12,
-                alignment=TA_LEFT
-            )
-            
             # Content
             story = []
             
             # Header
-            story.append(Paragraph(f"<b>{name}</b>", title_style))
+            story.append(Paragraph(f"<b>{name}</b>", TITLE_STYLE))
             if email or phone:
                 contact_info = []
                 if email:
                     contact_info.append(f"Email: {email}")
                 if phone:
                     contact_info.append(f"Phone: {phone}")
-                story.append(Paragraph(" | ".join(contact_info), header_style))
+                story.append(Paragraph(" | ".join(contact_info), HEADER_STYLE))
             
             story.append(Spacer(1, 20))
             
             # Date
             current_date = datetime.now().strftime("%B %d, %Y")
-            story.append(Paragraph(current_date, body_style))
+            story.append(Paragraph(current_date, BODY_STYLE))
             story.append(Spacer(1, 20))
             
             # Company info
-            story.append(Paragraph(f"<b>{company}</b><br/>Hiring Manager", body_style))
+            story.append(Paragraph(f"<b>{company}</b><br/>Hiring Manager", BODY_STYLE))
             story.append(Spacer(1, 20))
             
             # Salutation
-            story.append(Paragraph("Dear Hiring Manager,", body_style))
+            story.append(Paragraph("Dear Hiring Manager,", BODY_STYLE))
             story.append(Spacer(1, 12))
             
             # Body paragraphs (template)
-            body_content = [
-                f"I am writing to express my strong interest in the {position} position at {company}. With my background and passion for this field, I am confident that I would be a valuable addition to your team.",
-                
-                "In my previous experience, I have developed strong technical skills and a deep understanding of industry best practices. I am particularly drawn to this opportunity because of your company's reputation for innovation and excellence.",
-                
-                f"I would welcome the opportunity to discuss how my skills and enthusiasm can contribute to {company}'s continued success. Thank you for considering my application. I look forward to hearing from you soon."
-            ]
-            
-            for paragraph in body_content:
-                story.append(Paragraph(paragraph, body_style))
+            for text, frags in cover_letter_body(position, company):
+                story.append(Paragraph(text, BODY_STYLE, frags=frags))
                 story.append(Spacer(1, 12))
             
             # Closing
             story.append(Spacer(1, 20))
-            story.append(Paragraph("Sincerely,<br/><br/><br/>", body_style))
-            story.append(Paragraph(f"<b>{name}</b>", body_style))
+            story.append(Paragraph("Sincerely,<br/><br/><br/>", BODY_STYLE))
+            story.append(Paragraph(f"<b>{name}</b>", BODY_STYLE))
             
             # Build PDF
             doc.build(story)
@@ -304,6 +636,12 @@ class PDFProcessor:
 # Initialize processor
 pdf_processor = PDFProcessor()
 
+@app.before_request
+def reject_oversized_upload():
+    # Refuse on the declared Content-Length before any of the body is read or spooled
+    if request.content_length is not None and request.content_length > MAX_FILE_SIZE:
+        abort(413)
+
 # Routes
 @app.route('/')
 def index():
@@ -321,22 +659,28 @@ def merge_pdfs():
         if len(files) < 2:
             return jsonify({'error': 'At least 2 files required for merging'}), 400
         
-        file_paths = []
-        for file in files:
-            if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(file_path)
-                file_paths.append(file_path)
+        pdf_files = []
+        try:
+            for file in files:
+                if file and allowed_file(file.filename):
+                    pdf_file, _ = save_upload(file)
+                    pdf_files.append(pdf_file)
+        except Exception:
+            for pdf_file in pdf_files:
+                release_upload(pdf_file)
+            raise
         
-        if len(file_paths) < 2:
+        if len(pdf_files) < 2:
+            # merge_pdfs() never sees these, so release them here
+            for pdf_file in pdf_files:
+                release_upload(pdf_file)
             return jsonify({'error': 'Valid PDF files required'}), 400
         
-        output_path = pdf_processor.merge_pdfs(file_paths, output_name)
+        output_path = pdf_processor.merge_pdfs(pdf_files, output_name)
         
         return jsonify({
             'success': True,
-            'message': f'Successfully merged {len(file_paths)} PDF files',
+            'message': f'Successfully merged {len(pdf_files)} PDF files',
             'filename': os.path.basename(output_path)
         })
         
@@ -356,11 +700,9 @@ def add_watermark():
         if not (file and allowed_file(file.filename)):
             return jsonify({'error': 'Valid PDF file required'}), 400
         
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        pdf_file, _ = save_upload(file)
         
-        output_path = pdf_processor.add_watermark(file_path, watermark_text, output_name)
+        output_path = pdf_processor.add_watermark(pdf_file, watermark_text, output_name)
         
         return jsonify({
             'success': True,
@@ -378,15 +720,14 @@ def extract_text():
             return jsonify({'error': 'No file provided'}), 400
         
         file = request.files['file']
+        force_refresh = request.form.get('X-Force-Refresh', '').lower() in ('1', 'true', 'yes')
         
         if not (file and allowed_file(file.filename)):
             return jsonify({'error': 'Valid PDF file required'}), 400
         
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        pdf_file, digest = save_upload(file)
         
-        output_path, preview_text = pdf_processor.extract_text(file_path)
+        output_path, preview_text = pdf_processor.extract_text(pdf_file, force_refresh, digest)
         
         return jsonify({
             'success': True,
@@ -410,11 +751,9 @@ def split_pdf():
         if not (file and allowed_file(file.filename)):
             return jsonify({'error': 'Valid PDF file required'}), 400
         
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        pdf_file, _ = save_upload(file)
         
-        output_files = pdf_processor.split_pdf(file_path, pages_per_file)
+        output_files = pdf_processor.split_pdf(pdf_file, pages_per_file)
         
         return jsonify({
             'success': True,
@@ -438,11 +777,9 @@ def rotate_pdf():
         if not (file and allowed_file(file.filename)):
             return jsonify({'error': 'Valid PDF file required'}), 400
         
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        pdf_file, _ = save_upload(file)
         
-        output_path = pdf_processor.rotate_pdf(file_path, angle, output_name)
+        output_path = pdf_processor.rotate_pdf(pdf_file, angle, output_name)
         
         return jsonify({
             'success': True,
@@ -485,7 +822,7 @@ def create_cover_letter():
 def download_file(filename):
     try:
         file_path = os.path.join(app.config['OUTPUT_FOLDER'], filename)
-        if os.path.exists(file_path):
+        if os.path.isfile(file_path):
             return send_file(file_path, as_attachment=True)
         else:
             return jsonify({'error': 'File not found'}), 404
@@ -507,7 +844,7 @@ if __name__ == '__main__':
     print("- POST /api/cover-letter - Create cover letter")
     print("- GET /api/download/<filename> - Download file")
     
-    # Production ready configuration
+    # Development server only; production runs under Gunicorn with gevent workers (see Procfile)
     port = int(os.environ.get('PORT', 5000))
     debug_mode = os.environ.get('FLASK_ENV', 'production') != 'production'
     app.run(debug=debug_mode, host='0.0.0.0', port=port)
\ No newline at end of file